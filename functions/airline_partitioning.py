@@ -1,13 +1,155 @@
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
-import networkx as nx
+from numba import njit
 
-def airline_partitioning(flights_df):
+
+def _build_flow_network(graph):
+    """
+    Convert the dict-of-dicts graph into a CSR flow network.
+
+    Every edge is stored together with a zero-capacity back-edge, and `rev[e]` is the
+    position of the edge paired with `e`, as in the standard Edmonds-Karp layout.
+
+    Args:
+        graph (dict): The directed graph with capacities as edge weights.
+
+    Returns:
+        dict: 'nodes', 'index' (node -> int), 'indptr', 'indices', 'capacity' and 'rev' arrays,
+        plus the 'dtype' of the input capacities (the kernel itself works on float64).
+    """
+    nodes = list(graph)
+    for neighbors in graph.values():
+        nodes.extend(neighbors)
+    nodes = list(dict.fromkeys(nodes))
+    index = {node: i for i, node in enumerate(nodes)}
+
+    src = np.array([index[u] for u, neighbors in graph.items() for _ in neighbors], dtype=np.int32)
+    dst = np.array([index[v] for neighbors in graph.values() for v in neighbors], dtype=np.int32)
+    cap = np.array([c for neighbors in graph.values() for c in neighbors.values()])
+    dtype = cap.dtype
+    cap = cap.astype(np.float64)
+    m = len(src)
+
+    # forward edges are 0..m-1, their back-edges m..2m-1
+    tails = np.concatenate([src, dst])
+    heads = np.concatenate([dst, src])
+    capacity = np.concatenate([cap, np.zeros(m)])
+    pair = np.concatenate([np.arange(m, 2 * m), np.arange(m)])
+
+    # sort edges by tail node and remap the pair indices to the sorted positions
+    order = np.argsort(tails, kind='stable')
+    position = np.empty(2 * m, dtype=np.int32)
+    position[order] = np.arange(2 * m, dtype=np.int32)
+
+    indptr = np.zeros(len(nodes) + 1, dtype=np.int32)
+    np.cumsum(np.bincount(tails, minlength=len(nodes)), out=indptr[1:])
+
+    return {
+        'nodes': nodes,
+        'index': index,
+        'indptr': indptr,
+        'indices': heads[order],
+        'capacity': capacity[order],
+        'rev': position[pair[order]],
+        'dtype': dtype,
+    }
+
+
+@njit(cache=True)
+def _edmonds_karp(indptr, indices, residual, rev, source, sink):
+    """Push flow along BFS-shortest augmenting paths, updating `residual` in place. Returns the max flow."""
+    n = indptr.shape[0] - 1
+    parent_edge = np.full(n, -1, np.int32)
+    queue = np.empty(n, np.int32)
+    max_flow = 0.0
+
+    while True:
+        # BFS for an augmenting path, every node is enqueued at most once
+        parent_edge[:] = -1
+        head, tail = 0, 1
+        queue[0] = source
+        found = False
+        while head < tail and not found:
+            current = queue[head]
+            head += 1
+            for e in range(indptr[current], indptr[current + 1]):
+                neighbor = indices[e]
+                if neighbor != source and parent_edge[neighbor] == -1 and residual[e] > 0:
+                    parent_edge[neighbor] = e
+                    if neighbor == sink:
+                        found = True
+                        break
+                    queue[tail] = neighbor
+                    tail += 1
+        if not found:
+            return max_flow
+
+        # Find the minimum residual capacity along the path
+        path_flow = np.inf
+        v = sink
+        while v != source:
+            e = parent_edge[v]
+            path_flow = min(path_flow, residual[e])
+            v = indices[rev[e]]
+
+        # Update residual capacities
+        v = sink
+        while v != source:
+            e = parent_edge[v]
+            residual[e] -= path_flow
+            residual[rev[e]] += path_flow
+            v = indices[rev[e]]
+
+        max_flow += path_flow
+
+
+@njit(cache=True)
+def _reachable(indptr, indices, residual, source):
+    """Stack-based DFS marking every node reachable from `source` through positive residual capacity."""
+    n = indptr.shape[0] - 1
+    visited = np.zeros(n, np.bool_)
+    stack = np.empty(n, np.int32)
+    stack[0] = source
+    visited[source] = True
+    top = 1
+    while top > 0:
+        top -= 1
+        node = stack[top]
+        for e in range(indptr[node], indptr[node + 1]):
+            neighbor = indices[e]
+            if not visited[neighbor] and residual[e] > 0:
+                visited[neighbor] = True
+                stack[top] = neighbor
+                top += 1
+    return visited
+
+
+def _residual_to_dict(network):
+    """
+    Convert the CSR residual capacities back to the dict-of-dicts residual graph.
+
+    Back-edges only show up once flow has been pushed through them.
+    """
+    nodes, indptr, indices = network['nodes'], network['indptr'], network['indices']
+    # cast back so the residual capacities have the same type as the input ones
+    capacity, residual = network['capacity'], network['residual'].astype(network['dtype'])
+    residual_graph = {}
+    for u in range(len(nodes)):
+        for e in range(indptr[u], indptr[u + 1]):
+            if capacity[e] > 0 or residual[e] > 0:
+                neighbors = residual_graph.setdefault(nodes[u], {})
+                v = nodes[indices[e]]
+                neighbors[v] = neighbors.get(v, 0) + residual[e]
+    return residual_graph
+
+
+def airline_partitioning(flights_df, visualize=False):
     """
     Partition the airline flight network into two disconnected subgraphs by removing the minimum number of flights.
 
     Args:
         flights_df (pd.DataFrame): DataFrame with columns ['Origin_airport', 'Destination_airport', 'Distance'].
+        visualize (bool): Plot the network before and after removing the cut (off by default, the layout is expensive).
 
     Returns:
         removed_edges (list): List of flights removed to partition the graph.
@@ -15,97 +157,60 @@ def airline_partitioning(flights_df):
         graph_after (dict): Graph after removing the minimum cut edges.
     """
     # Build the graph
+    # Pull the three columns out as plain arrays once instead of boxing every row into a Series
+    origins = flights_df['Origin_airport'].to_numpy()
+    destinations = flights_df['Destination_airport'].to_numpy()
+    distances = flights_df['Distance'].to_numpy()
+
     graph = {}
-    for _, row in flights_df.iterrows():
-        origin, destination, distance = row['Origin_airport'], row['Destination_airport'], row['Distance']
-        if origin not in graph:
-            graph[origin] = {}
+    for origin, destination, distance in zip(origins, destinations, distances):
         # Add directed edge with its distance
-        graph[origin][destination] = distance
+        graph.setdefault(origin, {})[destination] = distance
 
     # Step 2: Ford-Fulkerson Algorithm to find the minimum cut
-    def ford_fulkerson(graph, source, sink):
+    def ford_fulkerson(network, source, sink):
         """
-        Implement the Ford-Fulkerson algorithm to find the maximum flow in a graph.
+        Implement the Ford-Fulkerson algorithm (Edmonds-Karp variant) to find the maximum flow in a graph.
 
         Args:
-            graph (dict): The directed graph with capacities as edge weights.
+            network (dict): CSR flow network built by `_build_flow_network`.
             source (str): The source node.
             sink (str): The sink node.
 
         Returns:
-            max_flow (int): The value of the maximum flow.
+            max_flow (int): The value of the maximum flow, with the same type as the capacities.
             residual_graph (dict): The residual graph after finding the maximum flow.
         """
-        # Create a residual graph
-        residual_graph = {u: neighbors.copy() for u, neighbors in graph.items()}
-        max_flow = 0
-        parent = {}
-
-        def bfs(source, sink):
-            """Find augmenting path using BFS."""
-            visited = set()
-            queue = [source]
-            parent.clear()
-            while queue:
-                current = queue.pop(0)
-                visited.add(current)
-                for neighbor, capacity in residual_graph.get(current, {}).items():
-                    if neighbor not in visited and capacity > 0:
-                        parent[neighbor] = current
-                        if neighbor == sink:
-                            return True
-                        queue.append(neighbor)
-            return False
-
-        # Augment flow while there is a path from source to sink
-        while bfs(source, sink):
-            # Find the minimum residual capacity along the path
-            path_flow = float('Inf')
-            s = sink
-            while s != source:
-                path_flow = min(path_flow, residual_graph[parent[s]][s])
-                s = parent[s]
-            
-            # Update residual capacities
-            v = sink
-            while v != source:
-                u = parent[v]
-                residual_graph[u][v] -= path_flow
-                residual_graph[v][u] = residual_graph.get(v, {}).get(u, 0) + path_flow
-                v = parent[v]
-
-            max_flow += path_flow
-
-        return max_flow, residual_graph
+        # Work on a copy so the original capacities stay available for the min cut
+        network['residual'] = network['capacity'].copy()
+        index = network['index']
+        max_flow = _edmonds_karp(network['indptr'], network['indices'], network['residual'],
+                                 network['rev'], index[source], index[sink])
+        max_flow = network['dtype'].type(max_flow)
+
+        return max_flow, _residual_to_dict(network)
 
     # Find the minimum cut
-    def find_min_cut(graph, source, residual_graph):
+    def find_min_cut(graph, source, network):
         """
         Identify the edges to remove to partition the graph.
 
         Args:
             graph (dict): Original graph with capacities as edge weights.
             source (str): The source node.
-            residual_graph (dict): The residual graph after computing max flow.
+            network (dict): CSR flow network holding the residual capacities after computing max flow.
 
         Returns:
             cut_edges (list): List of edges to be removed for partitioning.
         """
-        visited = set()
+        index = network['index']
+        # Mark all reachable nodes from the source
+        visited = _reachable(network['indptr'], network['indices'], network['residual'], index[source])
 
-        def dfs(node):
-            """Mark all reachable nodes from the source."""
-            visited.add(node)
-            for neighbor, capacity in residual_graph.get(node, {}).items():
-                if neighbor not in visited and capacity > 0:
-                    dfs(neighbor)
-
-        dfs(source)
         cut_edges = []
         for u in graph:
             for v, capacity in graph[u].items():
-                if u in visited and v not in visited:
+                if visited[index[u]] and not visited[index[v]]:
                     cut_edges.append((u, v))
 
         return cut_edges
@@ -114,8 +219,9 @@ def airline_partitioning(flights_df):
     airports = list(graph.keys())
     source, sink = airports[0], airports[1]
 
-    max_flow, residual_graph = ford_fulkerson(graph, source, sink)
-    removed_edges = find_min_cut(graph, source, residual_graph)
+    network = _build_flow_network(graph)
+    max_flow, residual_graph = ford_fulkerson(network, source, sink)
+    removed_edges = find_min_cut(graph, source, network)
 
     # Visualize the graph
 
@@ -128,6 +234,10 @@ def airline_partitioning(flights_df):
             removed_edges (list): List of edges to highlight as removed (optional).
             title (str): Title for the plot.
         """
+        # plotting is optional, so its imports are only paid when a plot is requested
+        import matplotlib.pyplot as plt
+        import networkx as nx
+
         # Create a networkx graph
         G = nx.Graph()
         
@@ -137,7 +247,8 @@ def airline_partitioning(flights_df):
                 G.add_edge(node, neighbor, weight=weight)
 
         # Draw the graph
-        pos = nx.spring_layout(G)  # Use spring layout for better visualization
+        # Use spring layout for better visualization, it is quadratic in the nodes so big networks get a random one
+        pos = nx.random_layout(G) if len(G) > 500 else nx.spring_layout(G)
         plt.figure(figsize=(12, 8))
         nx.draw_networkx_nodes(G, pos, node_size=500, node_color='lightblue')
         nx.draw_networkx_labels(G, pos, font_size=10, font_color='black')
@@ -145,17 +256,20 @@ def airline_partitioning(flights_df):
         # Draw edges
         if removed_edges:
             # Highlight removed edges in red
-            remaining_edges = [edge for edge in G.edges if edge not in removed_edges and edge[::-1] not in removed_edges]
+            # canonical (sorted) tuples make the membership test O(1) and direction independent
+            removed_set = frozenset(tuple(sorted(edge)) for edge in removed_edges)
+            remaining_edges = [edge for edge in G.edges if tuple(sorted(edge)) not in removed_set]
             nx.draw_networkx_edges(G, pos, edgelist=remaining_edges, edge_color='blue', width=1.5)
-            nx.draw_networkx_edges(G, pos, edgelist=removed_edges, edge_color='red', style='dashed', width=2)
+            nx.draw_networkx_edges(G, pos, edgelist=list(removed_set), edge_color='red', style='dashed', width=2)
         else:
             nx.draw_networkx_edges(G, pos, edge_color='blue', width=1.5)
 
         plt.title(title)
         plt.show()
 
-    visualize_graph(graph)
-    visualize_graph(graph, removed_edges, title='Airline Network After Removing The Connections')
+    if visualize:
+        visualize_graph(graph)
+        visualize_graph(graph, removed_edges, title='Airline Network After Removing The Connections')
 
     # Return the result
     return removed_edges, graph, residual_graph
\ No newline at end of file
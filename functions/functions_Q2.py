@@ -1,93 +1,229 @@
-def dijkstra_all_paths(source,graph,adjacency_list):
+import heapq
+
+import numpy as np
+import pandas as pd
+from numba import get_num_threads, njit, prange
+
+
+def _to_csr(graph, adjacency_list):
+
+    '''we store the weighted adjacency list as CSR arrays (node i's neighbours are indices[indptr[i]:indptr[i+1]])
+    so that the numba kernels below can work on plain arrays instead of dictionaries'''
+
+    nodes = list(graph.nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+    indices, weights = [], []
+    for i, node in enumerate(nodes):
+        for neighbor in adjacency_list[node]:
+            indices.append(index[neighbor])
+            weights.append(graph.edges[node, neighbor]['weight'])
+        indptr[i + 1] = len(indices)
+
+    return {
+        'nodes': nodes,
+        'index': index,
+        'indptr': indptr,
+        'indices': np.array(indices, dtype=np.int64),
+        'weights': np.array(weights, dtype=np.float64),
+    }
 
-    '''to calculate the shortest distances and paths from a node to the others we will use the dijkstra algorithm
-    with the addition of the use of heapq library to manage a priority queue'''
-    
-    from heapq import heappop, heappush
-    distances = {node: float('inf') for node in graph.nodes} # initialize the distances dictionary, they are initialized to nfinity as required by the algorithm 
-    paths = {node: [] for node in graph.nodes} # initialize the paths dictionary
-    paths[source] = [[source]] 
-    distances[source] = 0
+@njit(cache=True)
+def _dijkstra_dag(indptr, indices, weights, source, distances, sigma, order, pred_head, pred_node, pred_next):
+
+    '''dijkstra from the source keeping, instead of the paths themselves, the number of shortest paths (sigma) and
+    the predecessors of every node on them (a linked list per node in the flat pred_* arrays, -1 ends the list).
+    order receives the nodes in the order they are settled, the function returns how many were settled'''
 
-    priority_queue = [(0, source)]  # (distance, node) it's initialized to the source node
+    distances[:] = np.inf
+    sigma[:] = 0.0
+    pred_head[:] = -1
+    settled = np.zeros(distances.shape[0], np.bool_)
+    distances[source] = 0.0
+    sigma[source] = 1.0
+    pred_count = 0
+    count = 0
 
-    while priority_queue: #stops when there are no more nodes to process
-        
-        current_dist, current_node = heappop(priority_queue)
+    priority_queue = [(0.0, source)]  # (distance, node) it's initialized to the source node
+    while priority_queue:
+        current_dist, current_node = heapq.heappop(priority_queue)
 
-        # we can skip processing if this is not the shortest distance to the node
-        if current_dist > distances[current_node]:
+        # we can skip processing if this node was already reached through a shorter distance
+        if settled[current_node]:
             continue
+        settled[current_node] = True
+        order[count] = current_node
+        count += 1
 
-        for neighbor in adjacency_list[current_node]: #this would have been also possible by using the graph.neighbors function
-            edge_weight = graph.edges[current_node, neighbor]['weight']  # Keep edge weight lookup
-            new_dist = current_dist + edge_weight
+        for e in range(indptr[current_node], indptr[current_node + 1]):
+            neighbor = indices[e]
+            new_dist = current_dist + weights[e]
 
-            if new_dist < distances[neighbor]: #if we found a shorter distance we update the dictionary entry
+            if new_dist < distances[neighbor]: # shorter distance: the old predecessors are dropped
                 distances[neighbor] = new_dist
-                paths[neighbor] = [path + [neighbor] for path in paths[current_node]] # and also update the paths by extending the current node's paths to include the neighbor.
-                heappush(priority_queue, (new_dist, neighbor)) #pushes to priority queue
-            elif new_dist == distances[neighbor]:
-                paths[neighbor].extend(path + [neighbor] for path in paths[current_node]) # in this case we just want to update the paths
+                sigma[neighbor] = sigma[current_node]
+                pred_head[neighbor] = -1
+                heapq.heappush(priority_queue, (new_dist, neighbor))
+            elif new_dist == distances[neighbor]: # one more way to get there
+                sigma[neighbor] += sigma[current_node]
+            else:
+                continue
+            pred_node[pred_count] = current_node
+            pred_next[pred_count] = pred_head[neighbor]
+            pred_head[neighbor] = pred_count
+            pred_count += 1
+
+    return count
+
+@njit(parallel=True, cache=True)
+def _all_distances(indptr, indices, weights, n_threads):
+
+    '''runs the dijkstra kernel from every node and collects the distances in a n x n matrix.
+    The sources are independent, so they are split in one block per thread, each with its own scratch buffers
+    (n_threads comes from numba.get_num_threads() in the caller, so that the kernel can be cached).
+    Every row is filled by a single source, so the matrix is the same whatever the number of threads'''
+
+    n = indptr.shape[0] - 1
+    m = indices.shape[0]
+    dist_matrix = np.empty((n, n))
+    n_blocks = max(1, min(n_threads, n))
+    for block in prange(n_blocks):
+        sigma, order = np.empty(n), np.empty(n, np.int64)
+        pred_head, pred_node, pred_next = np.empty(n, np.int64), np.empty(m, np.int64), np.empty(m, np.int64)
+        for source in range(block, n, n_blocks):
+            _dijkstra_dag(indptr, indices, weights, source, dist_matrix[source], sigma, order, pred_head, pred_node, pred_next)
+    return dist_matrix
+
+@njit(parallel=True, cache=True)
+def _brandes_betweenness(indptr, indices, weights, n_threads):
+
+    '''Brandes' back-propagation: walking the settled nodes backwards every node passes its dependency
+    delta on to its predecessors, proportionally to their share sigma[pred] / sigma[node] of the shortest paths.
+    The sources are run n_slots at a time, one per thread with its own scratch buffers, and the dependencies
+    are added to the centrality in source order, so the sums are the same as in a sequential run whatever n_threads is'''
+
+    n = indptr.shape[0] - 1
+    m = indices.shape[0]
+    n_slots = max(1, min(n_threads, n))
+    distances, sigma, delta = np.empty((n_slots, n)), np.empty((n_slots, n)), np.empty((n_slots, n))
+    order, count = np.empty((n_slots, n), np.int64), np.empty(n_slots, np.int64)
+    pred_head, pred_node, pred_next = np.empty((n_slots, n), np.int64), np.empty((n_slots, m), np.int64), np.empty((n_slots, m), np.int64)
+    centrality = np.zeros(n)
+    for start in range(0, n, n_slots):
+        batch = min(n_slots, n - start)
+        for slot in prange(batch):
+            count[slot] = _dijkstra_dag(indptr, indices, weights, start + slot, distances[slot], sigma[slot], order[slot],
+                                        pred_head[slot], pred_node[slot], pred_next[slot])
+            delta[slot] = 0.0
+            for i in range(count[slot] - 1, 0, -1): # order[0] is the source itself
+                node = order[slot, i]
+                k = pred_head[slot, node]
+                while k != -1:
+                    pred = pred_node[slot, k]
+                    delta[slot, pred] += sigma[slot, pred] / sigma[slot, node] * (1 + delta[slot, node])
+                    k = pred_next[slot, k]
+        for slot in range(batch):
+            for i in range(1, count[slot]):
+                node = order[slot, i]
+                centrality[node] += delta[slot, node]
+    return centrality
+
+def dijkstra_all_paths(source,graph,adjacency_list):
+
+    '''to calculate the shortest distances and paths from a node to the others we will use the dijkstra algorithm.
+    The paths are not stored explicitly: we return for every node its predecessors on the shortest paths from the
+    source and the number of such paths, the paths themselves can be listed lazily with enumerate_shortest_paths'''
 
-    return paths, distances
+    csr = _to_csr(graph, adjacency_list)
+    nodes = csr['nodes']
+    n, m = len(nodes), len(csr['indices'])
+    distances, sigma, order = np.empty(n), np.empty(n), np.empty(n, dtype=np.int64)
+    pred_head, pred_node, pred_next = np.empty(n, dtype=np.int64), np.empty(m, dtype=np.int64), np.empty(m, dtype=np.int64)
+    _dijkstra_dag(csr['indptr'], csr['indices'], csr['weights'], csr['index'][source],
+                  distances, sigma, order, pred_head, pred_node, pred_next)
+
+    predecessors = {node: [] for node in nodes}
+    for i, node in enumerate(nodes):
+        k = pred_head[i]
+        while k != -1:
+            predecessors[node].append(nodes[pred_node[k]])
+            k = pred_next[k]
+
+    return predecessors, dict(zip(nodes, sigma.tolist())), dict(zip(nodes, distances.tolist()))
+
+def enumerate_shortest_paths(predecessors, source, target):
+
+    '''generator listing the shortest paths from source to target one at a time, following the predecessors
+    returned by dijkstra_all_paths backwards from the target'''
+
+    if target == source:
+        yield [source]
+        return
+    for pred in predecessors[target]:
+        for path in enumerate_shortest_paths(predecessors, source, pred):
+            yield path + [target]
 
 def all_shortest_paths(graph,adjacency_list):
 
-    """This function computes all the shortest paths and distances for every source-taget pairs in the graph.
-    This is probably a very unefficient way to go about olving this exercise but makes the subsequent calculations much easier"""
+    """This function computes the shortest distances for every source-taget pairs in the graph.
+    The first value returned is the CSR network the shortest paths are computed on: betweenness_centrality runs
+    the Brandes accumulation straight on it, so the paths themselves never need to be materialised"""
     
-    all_paths = [] # empty list of lists
-    all_distances = {source: {} for source in graph.nodes} #at the end we will have a dictionary of dictionaries of the form {source: {target_1 : distance, target_2: distance}} etc
-    for source in graph.nodes:
+    csr = _to_csr(graph, adjacency_list)
+    nodes = csr['nodes']
+    dist_matrix = _all_distances(csr['indptr'], csr['indices'], csr['weights'], get_num_threads())
 
-        source_paths, source_distances = dijkstra_all_paths(source, graph,adjacency_list) 
-        for target, target_paths in source_paths.items():
-            if target_paths and any(len(path) > 1 for path in target_paths): # we can filter out trivial paths
-                meaningful_paths = [path for path in target_paths if len(path) > 1] 
-                all_paths.append(meaningful_paths)
-            all_distances[source][target] = source_distances[target] #we update the dictionary of dictionaries
+    #the distances are kept as a dense n x n matrix labelled by the nodes, one column per source, so that
+    #all_distances[source][target] is still the distance from source to target as with the old dictionary of dictionaries
+    all_distances = pd.DataFrame(dist_matrix.T, index=nodes, columns=nodes)
 
-    return all_paths, all_distances
+    return csr, all_distances
 
-def betweenness_centrality(graph, shortest_paths):
+def betweenness_centrality(graph, shortest_paths, engine='python'):
 
-    from collections import defaultdict
-    import networkx as nx
-    
-    centrality = defaultdict(float) 
-    N = len(graph.nodes) #total number of nodes
+    '''
+    shortest_paths: the network returned by all_shortest_paths
+    engine: 'python' uses the numba kernels, 'igraph' or 'graphtool' delegate
+    the whole computation to the compiled library (shortest_paths is then ignored)
+    '''
 
-    for paths in shortest_paths:
-        path_count = len(paths)  # Number of equivalent shortest paths
-        node_contributions = defaultdict(float) 
+    from .graph_engines import check_engine, vertex_betweenness
+
+    check_engine(engine)
+    N = len(graph.nodes) #total number of nodes
+    scale = (N - 1) * (N - 2) # normalization term for directed graphs
 
-        for path in paths:
-            for node in path[1:-1]:  # we of course need to exclude the source and target nodes
-                node_contributions[node] += 1 / path_count #each other node gets a +1 in the count
+    if engine != 'python':
+        return {node: score / scale for node, score in vertex_betweenness(graph, engine, weight='weight').items()}
 
-        for node, contribution in node_contributions.items():
-            centrality[node] += contribution #update the centrality dict
+    centrality = _brandes_betweenness(shortest_paths['indptr'], shortest_paths['indices'], shortest_paths['weights'], get_num_threads())
 
     # to compute the final centrality score we need to apply normalization
-    scale = (N - 1) * (N - 2) # normalization term for directed graphs
-    for node in centrality:
-        centrality[node] /= scale
+    return dict(zip(shortest_paths['nodes'], (centrality / scale).tolist()))
 
-    return dict(centrality) #we convert the defaultdict to a normal dict
+def closeness_centrality(all_distances, graph=None, engine='python'):
 
-def closeness_centrality(all_distances):
+    '''
+    all_distances: the matrix of distances returned by all_shortest_paths
+    engine: 'python' uses the precomputed distances, 'igraph' or 'graphtool' delegate
+    the whole computation to the compiled library (the graph is then required)
+    '''
 
-    centrality = {}
-    #we will implement the formulation we found on wikipedia:
+    from .graph_engines import check_engine, harmonic_closeness
 
-    for node, distances in all_distances.items():
-        if len(distances.values()) > 1:
-            centrality[node] = sum([1 / x for x in distances.values() if x != 0])
-        else:
-            centrality[node] = 0.0
+    check_engine(engine)
+    if engine != 'python':
+        if graph is None:
+            raise ValueError(f"The '{engine}' engine needs the graph")
+        return harmonic_closeness(graph, engine, weight='weight')
 
-    return centrality
+    #we will implement the formulation we found on wikipedia, summing the inverse distances of every source's column:
+    #the node itself (distance 0) is skipped and unreachable nodes (distance inf) add 1 / inf = 0
+    dist_matrix = all_distances.to_numpy(dtype=float)
+    inverse = np.divide(1.0, dist_matrix, out=np.zeros_like(dist_matrix), where=dist_matrix > 0)
+    centrality = inverse.sum(axis=0)
+
+    return dict(zip(all_distances.columns, centrality.tolist()))
 
 def in_degree_centrality_adj(adjacency_list):
 
@@ -108,44 +244,54 @@ def in_degree_centrality_adj(adjacency_list):
 
     return centrality
 
-def compute_pagerank(graph, adjacency_list, damping_factor=0.85, max_iterations=100, tolerance=1e-6):
+def compute_pagerank(graph, adjacency_list, damping_factor=0.85, max_iterations=100, tolerance=1e-6, engine='python'):
 
     '''
     dumping factor: probability of following links
     max_iterations: Maximum number of iterations for the algorithm 
     tolerance: Convergence threshold for the scores
+    engine: 'python' runs the power iteration below, 'igraph' or 'graphtool' delegate to the compiled library
     '''
 
+    from scipy.sparse import csr_matrix, diags
+    from .graph_engines import check_engine, pagerank as engine_pagerank
+
+    check_engine(engine)
+    if engine != 'python':
+        return engine_pagerank(graph, engine, damping_factor=damping_factor, weight='weight')
+
     nodes = list(adjacency_list.keys())
     N = len(nodes)
-    pagerank = {node: 1 / N for node in nodes}  # we initialize the nodes' scores to 1/N assuming a uniform distribution 
-    new_pagerank = pagerank.copy() # this is just to save the updated scores as a separate object
+    index = {node: i for i, node in enumerate(nodes)}
+
+    # weighted adjacency matrix W[source, target] built once from the adjacency list
+    sources = [index[source] for source in nodes for target in adjacency_list[source]]
+    targets = [index[target] for source in nodes for target in adjacency_list[source]]
+    weights = [graph.edges[source, target]['weight'] for source in nodes for target in adjacency_list[source]]
+    W = csr_matrix((weights, (sources, targets)), shape=(N, N), dtype=float)
+
+    # we scale every row by the total weight of the outgoing edges and transpose it,
+    # so that M @ pagerank gives the weighted sum of incoming contributions for every node
+    total_outgoing_weight = np.asarray(W.sum(axis=1)).ravel()
+    dangling = total_outgoing_weight == 0 # nodes with no outgoing edges
+    inverse_weight = np.divide(1.0, total_outgoing_weight, out=np.zeros(N), where=~dangling)
+    M = (diags(inverse_weight) @ W).T.tocsr()
+
+    pagerank = np.full(N, 1 / N) # we initialize the nodes' scores to 1/N assuming a uniform distribution
+    new_pagerank = pagerank
 
     for iteration in range(max_iterations):
-        for node in nodes:
-            # Calculate the weighted sum of incoming edges
-            incoming_sum = 0
-            for source in adjacency_list:
-                if node in adjacency_list[source]:  # we need to check if `source -> node` is a valid step
-                    # we need to scale the contribution  
-                    weight = graph.edges[source, node]['weight'] 
-                    # Total weight of outgoing edges from `source`
-                    total_outgoing_weight = sum(graph.edges[source, neighbor]['weight'] for neighbor in adjacency_list[source])
-                    # Add contribution to the sum
-                    # I should add code to check for "no outgoing edges"
-                    incoming_sum += pagerank[source] * (weight / total_outgoing_weight)
-
-            # we implement the PageRank calculation
-            new_pagerank[node] = (1 - damping_factor) / N + damping_factor * incoming_sum
+        # the score of the dangling nodes would otherwise be lost, so we spread it uniformly
+        incoming_sum = M @ pagerank + pagerank[dangling].sum() / N
+        new_pagerank = (1 - damping_factor) / N + damping_factor * incoming_sum
 
         # Check for convergence
-        if all(abs(new_pagerank[node] - pagerank[node]) < tolerance for node in nodes): #check condition on all iterables and return true only if all are true
+        if np.abs(new_pagerank - pagerank).max() < tolerance:
             break
 
         # Update the PageRank scores for the next iteration
-        pagerank = new_pagerank.copy()
-        # if got time try parallelization...
-    return new_pagerank
+        pagerank = new_pagerank
+    return dict(zip(nodes, new_pagerank.tolist()))
 
 def plot_centrality_distributions(final_scores):
         """
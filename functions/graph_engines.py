@@ -0,0 +1,138 @@
+ENGINES = ('python', 'igraph', 'graphtool')
+
+
+def check_engine(engine):
+    """
+    Make sure the requested engine is one of the supported ones.
+    Parameters:
+        engine (str): 'python', 'igraph' or 'graphtool'.
+    Raises:
+        ValueError: If the engine is not supported.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+
+
+def to_igraph(graph, weight=None):
+    """
+    Convert a NetworkX graph into an igraph graph, vertex i being nodes[i] and edge j being the j-th edge of graph.edges.
+    Parameters:
+        graph (networkx.Graph or networkx.DiGraph): The graph to convert.
+        weight (str): Name of the edge attribute to copy as the 'weight' of the edges (optional).
+    Returns:
+        tuple: The igraph graph and the list of nodes.
+    """
+    import igraph as ig
+
+    nodes = list(graph.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    g = ig.Graph(n=len(nodes), edges=[(index[u], index[v]) for u, v in graph.edges], directed=graph.is_directed())
+    if weight is not None:
+        g.es['weight'] = [data[weight] for _, _, data in graph.edges(data=True)]
+    return g, nodes
+
+
+def to_graph_tool(graph, weight=None):
+    """
+    Convert a NetworkX graph into a graph-tool graph, vertex i being nodes[i] and edge j being the j-th edge of graph.edges.
+    Parameters:
+        graph (networkx.Graph or networkx.DiGraph): The graph to convert.
+        weight (str): Name of the edge attribute to copy into a 'double' edge property (optional).
+    Returns:
+        tuple: The graph-tool graph, the list of nodes and the weight edge property (None without weight).
+    """
+    import graph_tool.all as gt
+
+    nodes = list(graph.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    g = gt.Graph(directed=graph.is_directed())
+    g.add_vertex(len(nodes))
+    if weight is None:
+        g.add_edge_list([(index[u], index[v]) for u, v in graph.edges])
+        return g, nodes, None
+    weights = g.new_edge_property('double')
+    g.add_edge_list([(index[u], index[v], data[weight]) for u, v, data in graph.edges(data=True)], eprops=[weights])
+    return g, nodes, weights
+
+
+def vertex_betweenness(graph, engine, weight=None):
+    """
+    Raw (not normalized) betweenness of every node computed by the compiled library.
+    Parameters:
+        graph (networkx.Graph or networkx.DiGraph): The input graph.
+        engine (str): 'igraph' or 'graphtool'.
+        weight (str): Name of the edge attribute holding the weights (optional).
+    Returns:
+        dict: A dictionary where keys are nodes and values are the betweenness scores.
+    """
+    if engine == 'igraph':
+        g, nodes = to_igraph(graph, weight)
+        scores = g.betweenness(directed=graph.is_directed(), weights='weight' if weight else None)
+    else:
+        import graph_tool.all as gt
+        g, nodes, weights = to_graph_tool(graph, weight)
+        scores = gt.betweenness(g, weight=weights, norm=False)[0].a
+    return dict(zip(nodes, map(float, scores)))
+
+
+def edge_betweenness(graph, engine, weight=None, sources=None):
+    """
+    Raw (not normalized) betweenness of every edge computed by the compiled library.
+    Parameters:
+        graph (networkx.Graph or networkx.DiGraph): The input graph.
+        engine (str): 'igraph' or 'graphtool'.
+        weight (str): Name of the edge attribute holding the weights (optional).
+        sources (list): Positions in graph.nodes() of the only sources of shortest paths to consider (optional, all by default).
+    Returns:
+        dict: A dictionary where keys are edges (sorted tuples of nodes) and values are the EBC scores.
+    """
+    if engine == 'igraph':
+        g, _ = to_igraph(graph, weight)
+        scores = g.edge_betweenness(directed=graph.is_directed(), weights='weight' if weight else None, sources=sources)
+    else:
+        import graph_tool.all as gt
+        g, _, weights = to_graph_tool(graph, weight)
+        pivots = None if sources is None else [g.vertex(source) for source in sources]
+        scores = gt.betweenness(g, pivots=pivots, weight=weights, norm=False)[1].a
+    return {tuple(sorted(edge)): float(score) for edge, score in zip(graph.edges, scores)}
+
+
+def harmonic_closeness(graph, engine, weight=None):
+    """
+    Sum of the inverse distances from every node to the nodes it can reach, computed by the compiled library.
+    Parameters:
+        graph (networkx.Graph or networkx.DiGraph): The input graph.
+        engine (str): 'igraph' or 'graphtool'.
+        weight (str): Name of the edge attribute holding the weights (optional).
+    Returns:
+        dict: A dictionary where keys are nodes and values are the closeness scores.
+    """
+    if engine == 'igraph':
+        g, nodes = to_igraph(graph, weight)
+        scores = g.harmonic_centrality(mode='out', weights='weight' if weight else None, normalized=False)
+    else:
+        import graph_tool.all as gt
+        g, nodes, weights = to_graph_tool(graph, weight)
+        scores = gt.closeness(g, weight=weights, harmonic=True, norm=False).a
+    return dict(zip(nodes, map(float, scores)))
+
+
+def pagerank(graph, engine, damping_factor=0.85, weight=None):
+    """
+    PageRank of every node computed by the compiled library.
+    Parameters:
+        graph (networkx.Graph or networkx.DiGraph): The input graph.
+        engine (str): 'igraph' or 'graphtool'.
+        damping_factor (float): Probability of following links.
+        weight (str): Name of the edge attribute holding the weights (optional).
+    Returns:
+        dict: A dictionary where keys are nodes and values are the PageRank scores.
+    """
+    if engine == 'igraph':
+        g, nodes = to_igraph(graph, weight)
+        scores = g.pagerank(directed=graph.is_directed(), damping=damping_factor, weights='weight' if weight else None)
+    else:
+        import graph_tool.all as gt
+        g, nodes, weights = to_graph_tool(graph, weight)
+        scores = gt.pagerank(g, damping=damping_factor, weight=weights).a
+    return dict(zip(nodes, map(float, scores)))
@@ -1,83 +1,270 @@
-from collections import deque
+import random
 
+import numpy as np
+from numba import get_num_threads, njit, prange
 
-def edge_betweenness_centrality(graph):
+from .graph_engines import check_engine, edge_betweenness
+
+
+def _to_csr(graph):
+    """
+    Build a CSR representation of an undirected graph.
+    Parameters:
+        graph (networkx.Graph): The input graph.
+    Returns:
+        dict: 'nodes', 'index' (node -> int), 'edges' (canonical sorted tuples), and the
+        'indptr', 'indices', 'edge_ids' arrays, where edge_ids[e] is the undirected edge behind adjacency entry e.
+    """
+    nodes = list(graph.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = [tuple(sorted(edge)) for edge in graph.edges]
+    edge_index = {edge: i for i, edge in enumerate(edges)}
+
+    indptr = np.zeros(len(nodes) + 1, dtype=np.int32)
+    indices, edge_ids = [], []
+    # keeps the neighbour order of graph.neighbors, so the BFS visits nodes in the same order
+    for i, node in enumerate(nodes):
+        for neighbor in graph.neighbors(node):
+            indices.append(index[neighbor])
+            edge_ids.append(edge_index[tuple(sorted((node, neighbor)))])
+        indptr[i + 1] = len(indices)
+
+    return {
+        'nodes': nodes,
+        'index': index,
+        'edges': edges,
+        'indptr': indptr,
+        'indices': np.array(indices, dtype=np.int32),
+        'edge_ids': np.array(edge_ids, dtype=np.int32),
+    }
+
+
+
+
+@njit(cache=True)
+def _single_source(indptr, indices, edge_ids, alive, source,
+                   distance, sigma, delta, stack, pred_head, pred_node, pred_edge, pred_next, pred_value):
+    """
+    One source of Brandes' algorithm: BFS from the source over the alive edges, then back-propagation
+    of the dependencies. Returns the number of predecessor entries, entry k carrying the contribution
+    pred_value[k] of the source to the (not yet halved) EBC score of edge pred_edge[k]; every edge
+    shows up at most once. The other arrays are scratch buffers.
+    """
+    distance[:] = -1
+    sigma[:] = 0.0
+    delta[:] = 0.0
+    pred_head[:] = -1
+    pred_count = 0
+    distance[source] = 0
+    sigma[source] = 1.0
+
+    # BFS from the source, updating distance, sigma and the predecessors
+    stack[0] = source
+    head, tail = 0, 1
+    while head < tail:
+        current = stack[head]
+        head += 1
+        for e in range(indptr[current], indptr[current + 1]):
+            edge = edge_ids[e]
+            if not alive[edge]:
+                continue
+            neighbor = indices[e]
+            if distance[neighbor] < 0:
+                distance[neighbor] = distance[current] + 1
+                stack[tail] = neighbor
+                tail += 1
+            if distance[neighbor] == distance[current] + 1:
+                sigma[neighbor] += sigma[current]
+                pred_node[pred_count] = current
+                pred_edge[pred_count] = edge
+                pred_next[pred_count] = pred_head[neighbor]
+                pred_head[neighbor] = pred_count
+                pred_count += 1
+
+    # calculates scores walking the stack from the farthest node back to the source
+    for i in range(tail - 1, 0, -1):
+        node = stack[i]
+        k = pred_head[node]
+        while k != -1:
+            pred = pred_node[k]
+            contribution = (sigma[pred] / sigma[node]) * (1 + delta[node])
+            pred_value[k] = contribution
+            delta[pred] += contribution
+            k = pred_next[k]
+
+    return pred_count
+
+
+
+
+@njit(parallel=True, cache=True)
+def _brandes(indptr, indices, edge_ids, alive, sources, n_threads):
+    """
+    Brandes' algorithm on CSR arrays from the given sources, skipping the edges marked as not alive,
+    spread over n_threads threads (numba.get_num_threads() from the caller, keeping the kernel cacheable).
+    Returns the array of EBC scores indexed by edge id.
+    """
+    n = indptr.shape[0] - 1
+    n_entries = indices.shape[0]
+    # the sources are run n_slots at a time, one per thread, each slot with its own scratch buffers
+    n_slots = max(1, min(n_threads, sources.shape[0]))
+    distance = np.empty((n_slots, n), np.int32)
+    sigma = np.empty((n_slots, n))
+    delta = np.empty((n_slots, n))
+    # the BFS queue is never popped from the array, so read backwards it is the stack
+    stack = np.empty((n_slots, n), np.int32)
+    # predecessors as one singly-linked list per node stored in flat arrays:
+    # pred_head[node] is the first entry, pred_next[k] the following one, -1 ends the list
+    pred_head = np.empty((n_slots, n), np.int32)
+    pred_node = np.empty((n_slots, n_entries), np.int32)
+    pred_edge = np.empty((n_slots, n_entries), np.int32)
+    pred_next = np.empty((n_slots, n_entries), np.int32)
+    pred_value = np.empty((n_slots, n_entries))
+    pred_count = np.empty(n_slots, np.int64)
+
+    ebc = np.zeros(alive.shape[0])
+    for start in range(0, sources.shape[0], n_slots):
+        batch = min(n_slots, sources.shape[0] - start)
+        for slot in prange(batch):
+            pred_count[slot] = _single_source(indptr, indices, edge_ids, alive, sources[start + slot],
+                                              distance[slot], sigma[slot], delta[slot], stack[slot], pred_head[slot],
+                                              pred_node[slot], pred_edge[slot], pred_next[slot], pred_value[slot])
+        # the contributions are added in source order, so the floating point sums (and the
+        # edges that come out on top) are the same as in a sequential run whatever n_threads is
+        for slot in range(batch):
+            for k in range(pred_count[slot]):
+                ebc[pred_edge[slot, k]] += pred_value[slot, k]
+
+    # being an undirected graph, to avoid double counting, we divide each score by 2
+    return ebc / 2.0
+
+
+
+
+@njit(cache=True)
+def _connected(indptr, indices, edge_ids, alive, u, v):
+    """Check with a BFS whether v can still be reached from u through the alive edges."""
+    n = indptr.shape[0] - 1
+    visited = np.zeros(n, np.bool_)
+    queue = np.empty(n, np.int32)
+    queue[0] = u
+    visited[u] = True
+    head, tail = 0, 1
+    while head < tail:
+        current = queue[head]
+        head += 1
+        for e in range(indptr[current], indptr[current + 1]):
+            neighbor = indices[e]
+            if alive[edge_ids[e]] and not visited[neighbor]:
+                if neighbor == v:
+                    return True
+                visited[neighbor] = True
+                queue[tail] = neighbor
+                tail += 1
+    return False
+
+
+
+
+def _sample_sources(n, k=None):
+    """
+    Pick the sources of the shortest paths used for the EBC.
+    Parameters:
+        n (int): Number of nodes.
+        k (int): Number of sources to sample at random (optional, all the nodes by default).
+    Returns:
+        np.ndarray: The sorted positions of the sources in the node list.
+    Raises:
+        ValueError: If k is not between 1 and n.
+    """
+    if k is None:
+        return np.arange(n, dtype=np.int32)
+    if not 1 <= k <= n:
+        raise ValueError(f"k must be between 1 and the number of nodes ({n}), got {k}")
+    return np.array(sorted(random.sample(range(n), k)), dtype=np.int32)
+
+
+
+
+def _edge_scores(graph, k=None, engine='python'):
+    """
+    Compute the EBC scores of the edges of the graph, exactly or estimated from k random sources.
+    Parameters:
+        graph (networkx.Graph): The input graph.
+        k (int): Number of sources to sample, see edge_betweenness_centrality.
+        engine (str): 'python', 'igraph' or 'graphtool', see edge_betweenness_centrality.
+    Returns:
+        tuple: The list of edges (sorted tuples of nodes, in graph.edges order) and the array of their EBC scores.
+    """
+    check_engine(engine)
+    n = graph.number_of_nodes()
+    sources = _sample_sources(n, k)
+    # with k sources every pair is seen on average k / n times as often, so we scale back by n / k
+    scale = n / len(sources) if k is not None else 1.0
+
+    if engine != 'python':
+        N_dict = edge_betweenness(graph, engine, sources=None if k is None else sources.tolist())
+        return list(N_dict), np.array(list(N_dict.values())) * scale
+
+    csr = _to_csr(graph)
+    alive = np.ones(len(csr['edges']), dtype=np.bool_)
+    ebc_scores = _brandes(csr['indptr'], csr['indices'], csr['edge_ids'], alive, sources, get_num_threads())
+
+    return csr['edges'], ebc_scores * scale
+
+
+
+
+def edge_betweenness_centrality(graph, k=None, engine='python'):
     """
     Calculate the edge betweenness centrality (EBC) for each edge in the given graph.
     Parameters:
         graph (networkx.Graph): The input graph for which to calculate edge betweenness centrality.
+        k (int): If given, the EBC is estimated from the shortest paths of k randomly sampled sources
+            (Brandes-Pich estimator) instead of all the nodes, which is about n / k times faster.
+        engine (str): 'python' for the CSR kernel, 'igraph' or 'graphtool' to delegate to the compiled library.
     Returns:
         dict: A dictionary where keys are edges (tuples of nodes) and values are the EBC scores.
+    Raises:
+        ValueError: If k is not between 1 and the number of nodes.
     """
-    # initialize EBC scores for each edge to zero
-    ebc_scores = {tuple(sorted(edge)): 0 for edge in graph.edges}
-    
-    for source in graph.nodes(): # iterate on each node of the graph
-        # initializes the distance from the source node to all other nodes as infinity, 
-        # except for the source node itself, which has a distance of zero
-        distance = {node: float('inf') for node in graph.nodes()}
-        distance[source] = 0
-        # initializes the number of shortest paths from the source node to all other nodes as zero, 
-        # except for the source node itself, which has one shortest path
-        sigma = {node: 0 for node in graph.nodes()}
-        sigma[source] = 1    
-        # initializes a list of predecessors for each node as an empty list 
-        # to keep track of the nodes that precede it on the shortest paths.
-        predecessors = {node: [] for node in graph.nodes()}
-        
-        # uses a breadth-first search (BFS) to find the shortest paths 
-        # from the source node to all other nodes. During this process, 
-        # it updates the distance, sigma, and predecessors for each node.
-        queue = deque([source])
-        stack = []  
-        # if there are at least one element left in the queue
-        while queue:
-            # remove the node from the queue and add it to the stack
-            current = queue.popleft()
-            stack.append(current)    
-            # for each neighbors of the current node
-            for neighbor in graph.neighbors(current):
-                # if the visted node is new, updates his distance and appends it to the queue
-                if distance[neighbor] == float('inf'):
-                    distance[neighbor] = distance[current] + 1
-                    queue.append(neighbor)
-                # updates the number of shorter paths, of the current neighbor
-                if distance[neighbor] == distance[current] + 1:
-                    sigma[neighbor] += sigma[current]
-                    predecessors[neighbor].append(current)
-        
-        # it initializes a dictionary delta to store the dependency of each node on the source node
-        delta = {node: 0.0 for node in graph.nodes()}
-        # calculates scores
-        while stack:
-            node = stack.pop()
-            for pred in predecessors[node]:
-                contribution = (sigma[pred] / sigma[node]) * (1 + delta[node])
-                edge = tuple(sorted((node, pred)))  # not oriented edges
-                ebc_scores[edge] += contribution
-                delta[pred] += contribution
-    
-    # being an undirected graph, to avoid double counting, we divide each score by 2
-    for edge in ebc_scores:
-        ebc_scores[edge] /= 2.0
-    
-    return ebc_scores
+    edges, ebc_scores = _edge_scores(graph, k=k, engine=engine)
+
+    return dict(zip(edges, ebc_scores.tolist()))
 
 
 
 
-def edge_to_remove(graph):
+def edge_betweenness_max(graph, k=None, engine='python'):
+    """
+    Find the edge with the highest edge betweenness centrality (EBC) score without building the whole EBC dictionary.
+    Parameters:
+        graph (networkx.Graph): The input graph.
+        k (int): Number of sources to sample, see edge_betweenness_centrality.
+        engine (str): 'python', 'igraph' or 'graphtool', see edge_betweenness_centrality.
+    Returns:
+        tuple: The edge with the highest EBC score (first one on ties, in graph.edges order, for any number of threads) and its score.
+    """
+    edges, ebc_scores = _edge_scores(graph, k=k, engine=engine)
+    # the maximum is taken straight on the score array, edges are only looked up for the winner
+    edge_id = int(np.argmax(ebc_scores))
+
+    return edges[edge_id], float(ebc_scores[edge_id])
+
+
+
+
+def edge_to_remove(graph, k=None, engine='python'):
     """
     Identifies the edge with the highest edge betweenness centrality (EBC) score in the given graph.
     Parameters:
         graph (networkx.Graph): A NetworkX graph object.
+        k (int): Number of sources to sample, see edge_betweenness_centrality.
+        engine (str): 'python', 'igraph' or 'graphtool', see edge_betweenness_centrality.
     Returns:
         tuple: A tuple representing the edge with the highest EBC score.
     """
-    N_dict = edge_betweenness_centrality(graph)
-
-    # extract the edge with highest ebc score
-    max_edge = max(N_dict, key=N_dict.get) #find the key associated with the max value in the dict
+    max_edge, _ = edge_betweenness_max(graph, k=k, engine=engine)
 
     return max_edge
 
@@ -96,12 +283,16 @@ def connected_components(graph):
     visited = set() # already visited nodes
     components = [] # will contain sets of nodes of a connected component
 
-    def dfs(node, component):
-        visited.add(node)
-        component.add(node)
-        for neighbor in graph.neighbors(node):
-            if neighbor not in visited:
-                dfs(neighbor, component)
+    def dfs(start, component):
+        # iterative DFS with an explicit stack, so deep components do not hit the recursion limit
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            if node in visited:
+                continue
+            visited.add(node)
+            component.add(node)
+            stack.extend(neighbor for neighbor in graph.neighbors(node) if neighbor not in visited)
 
     for node in graph.nodes():
         if node not in visited:
@@ -114,23 +305,49 @@ def connected_components(graph):
 
 
 
-def girvan_newman(graph):
+def girvan_newman(graph, k=None, engine='python'):
 	"""
 	Implements the Girvan-Newman algorithm to detect communities in a graph by progressively removing edges.
 	Parameters:
 		graph (networkx.Graph): The input graph on which to perform community detection.
+		k (int): Number of sources to sample for the EBC, see edge_betweenness_centrality (optional, exact by default).
+		engine (str): 'python', 'igraph' or 'graphtool', see edge_betweenness_centrality.
 	Returns:
 		list: A list of sets, where each set contains the nodes of a connected component in the graph.
 	Notes:
 	- This function uses the edge betweenness centrality to identify and remove edges.
 	- The process continues until the graph is split into multiple connected components.
 	"""
+	check_engine(engine)
+	# with k the same random sources are kept for the whole run, whichever the engine
+	# (only edges are removed, so their positions in graph.nodes() stay valid)
+	sources = _sample_sources(graph.number_of_nodes(), k)
 	sg = connected_components(graph)
-	sg_count = len(sg) # number_connected_components(graph)
-
-	while sg_count == 1:
-		edge = edge_to_remove(graph)
-		graph.remove_edge(edge[0], edge[1])
-		sg = connected_components(graph)
-		sg_count = len(sg) # number_connected_components(graph)
-	return sg
\ No newline at end of file
+	if len(sg) != 1:
+		return sg
+
+	if engine != 'python':
+		# the compiled libraries recompute the EBC from scratch after every removal
+		pivots = None if k is None else sources.tolist()
+		while len(sg) == 1:
+			N_dict = edge_betweenness(graph, engine, sources=pivots)
+			edge = max(N_dict, key=N_dict.get)
+			graph.remove_edge(edge[0], edge[1])
+			sg = connected_components(graph)
+		return sg
+
+	# the CSR arrays are built once, removed edges are only switched off in `alive`
+	csr = _to_csr(graph)
+	index = csr['index']
+	alive = np.ones(len(csr['edges']), dtype=np.bool_)
+	n_threads = get_num_threads()
+
+	while True:
+		ebc_scores = _brandes(csr['indptr'], csr['indices'], csr['edge_ids'], alive, sources, n_threads)
+		edge_id = int(np.argmax(ebc_scores))
+		u, v = csr['edges'][edge_id]
+		graph.remove_edge(u, v)
+		alive[edge_id] = False
+		# the graph only splits if the endpoints of the removed edge got disconnected
+		if not _connected(csr['indptr'], csr['indices'], csr['edge_ids'], alive, index[u], index[v]):
+			return connected_components(graph)
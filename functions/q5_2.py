@@ -1,3 +1,7 @@
+import random
+from collections import Counter
+
+
 def initialize_labels(graph):
     """
     This function assigns each node in the graph a unique label (which is the node itself).
@@ -21,18 +25,25 @@ def propagate_labels(graph, labels):
     Returns:
         dict: The updated labels dictionary after propagation.
     """
+    # neighbours are looked up once instead of building a new NetworkX view in every sweep
+    nodes = list(graph.nodes())
+    adj = {node: list(graph.neighbors(node)) for node in nodes}
     changed = True
     while changed:
         changed = False
-        for node in graph.nodes():
+        # the asynchronous updates converge better when nodes are visited in random order
+        random.shuffle(nodes)
+        for node in nodes:
             # collects labels from neighbors
-            neighbor_labels = [labels[neighbor] for neighbor in graph.neighbors(node)]
+            neighbor_labels = [labels[neighbor] for neighbor in adj[node]]
             if not neighbor_labels:
                 continue
-            # determines the most frequent label among neighbors
-            most_frequent_label = max(set(neighbor_labels), key=neighbor_labels.count)
-            # updates the node's label if it changes
-            if labels[node] != most_frequent_label:
+            # determines the most frequent label among neighbors in a single counting pass
+            label_counts = Counter(neighbor_labels)
+            most_frequent_label, max_count = label_counts.most_common(1)[0]
+            # updates the node's label if it changes; on ties the node keeps its current label,
+            # otherwise two tied labels can flip forever
+            if label_counts[labels[node]] < max_count:
                 labels[node] = most_frequent_label
                 changed = True
     return labels
@@ -1,5 +1,48 @@
-import heapq
+import numpy as np
 import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+FLIGHT_COLUMNS = ['Origin_airport', 'Destination_airport', 'Distance', 'Origin_city', 'Destination_city']
+
+
+class RoutePlanner:
+    """
+    Answer repeated best-route queries on the same flights dataset.
+
+    The flights are split by date once, so every query only looks at the flights of its own day
+    instead of scanning the whole 'Fly_date' column again.
+
+    Args:
+        flights_df (pd.DataFrame): A DataFrame containing flight information, with the same columns as in find_best_route.
+    """
+
+    def __init__(self, flights_df):
+        # Convert the dates once, so lookups compare datetime64 values instead of strings
+        fly_dates = pd.to_datetime(flights_df['Fly_date'])
+        columns = [flights_df[column].to_numpy() for column in FLIGHT_COLUMNS]
+        self.by_date = {
+            date: tuple(values[rows] for values in columns)
+            for date, rows in flights_df.groupby(fly_dates).indices.items()
+        }
+
+    def find_best_route(self, origin_city, destination_city, date):
+        """
+        Find the best flight routes between two cities on a given date, see find_best_route.
+
+        Args:
+            origin_city (str): Name of the origin city.
+            destination_city (str): Name of the destination city.
+            date (str): The date for which to find flights (format: YYYY-MM-DD).
+
+        Returns:
+            pd.DataFrame: A DataFrame containing the best routes for all origin-destination airport pairs.
+        """
+        flights = self.by_date.get(pd.Timestamp(date))
+        if flights is None:
+            return pd.DataFrame()
+        return _best_routes(*flights, origin_city, destination_city)
+
 
 def find_best_route(flights_df, origin_city, destination_city, date):
     """
@@ -24,76 +67,82 @@ def find_best_route(flights_df, origin_city, destination_city, date):
             - 'Origin_city_airport': Airport code of the origin city.
             - 'Destination_city_airport': Airport code of the destination city.
             - 'Best_route': Shortest route as a string or 'No route found' if no route exists.
+
+    For repeated queries on the same dataset use RoutePlanner, which splits the flights by date only once.
     """
-    # Filter the flights dataset for the given date
-    flights_df = flights_df[flights_df['Fly_date'] == date]
-    
-    # Create a dictionary for the graph
-    graph = {}
-
-    # Add edges to the graph
-    for _, row in flights_df.iterrows():
-        origin = row['Origin_airport']
-        destination = row['Destination_airport']
-        distance = row['Distance']
-        
-        if origin not in graph:
-            graph[origin] = []
-        graph[origin].append((destination, distance))
-    
-    # Get the airports for the origin and destination cities
-    origin_airports = flights_df[flights_df['Origin_city'] == origin_city]['Origin_airport'].unique()
-    destination_airports = flights_df[flights_df['Destination_city'] == destination_city]['Destination_airport'].unique()
+    # Filter the flights dataset for the given date with a single boolean mask
+    on_date = (flights_df['Fly_date'] == date).to_numpy()
+    flights = [flights_df[column].to_numpy()[on_date] for column in FLIGHT_COLUMNS]
+    return _best_routes(*flights, origin_city, destination_city)
 
-    def dijkstra(start, target):
-        """
-        Perform Dijkstra's algorithm to find the shortest path between two airports.
 
-        Args:
-            start (str): The starting airport code.
-            target (str): The target airport code.
+def _best_routes(origins, destinations, distances, origin_cities, destination_cities, origin_city, destination_city):
+    """
+    Compute the best routes between the airports of two cities given the flights of a single day.
 
-        Returns:
-            list or None: The shortest path as a list of airport codes, or None if no path exists.
-        """
-        # Min-heap for the priority queue
-        pq = [(0, start, [])]  # (distance, current_node, path_taken)
-        visited = set()
+    Args:
+        origins, destinations, distances, origin_cities, destination_cities (np.ndarray): The columns of the day's flights.
+        origin_city (str): Name of the origin city.
+        destination_city (str): Name of the destination city.
 
-        while pq:
-            current_distance, current_node, path = heapq.heappop(pq)
+    Returns:
+        pd.DataFrame: A DataFrame containing the best routes for all origin-destination airport pairs.
+    """
+    # Map airport codes to integer ids
+    airport_ids, airports = pd.factorize(pd.Index(np.concatenate([origins, destinations])))
+    src, dst = airport_ids[:len(origins)], airport_ids[len(origins):]
+    n = len(airports)
 
-            # If the destination is reached, return the path
-            if current_node == target:
-                return path + [current_node]
+    # csr_matrix sums duplicate entries, so keep only the shortest flight for every airport pair
+    order = np.lexsort((distances, src * n + dst))
+    pair_keys = (src * n + dst)[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = pair_keys[1:] != pair_keys[:-1]
+    order = order[first]
 
-            if current_node not in visited:
-                visited.add(current_node)
+    # Build the graph once as a sparse matrix
+    graph = csr_matrix((distances[order].astype(np.float64), (src[order], dst[order])), shape=(n, n))
+    
+    # Get the airports for the origin and destination cities from the already filtered arrays, in order of first appearance
+    origin_airports = pd.unique(origins[origin_cities == origin_city])
+    destination_airports = pd.unique(destinations[destination_cities == destination_city])
 
-                for neighbor, weight in graph.get(current_node, []):
-                    if neighbor not in visited:
-                        heapq.heappush(pq, (current_distance + weight, neighbor, path + [current_node]))
+    # A single multi-source Dijkstra run from every origin airport
+    origin_idx = airports.get_indexer(origin_airports)
+    destination_idx = airports.get_indexer(destination_airports)
+    dist_matrix, predecessors = dijkstra(graph, directed=True, indices=origin_idx, return_predecessors=True)
+
+    def reconstruct_path(row, start, target):
+        """
+        Walk the predecessor matrix back from the target to recover the shortest path.
 
-        return None  # No path found
+        Args:
+            row (int): Row of the predecessor matrix belonging to the start airport.
+            start (int): Id of the starting airport.
+            target (int): Id of the target airport.
+
+        Returns:
+            list: The shortest path as a list of airport codes.
+        """
+        path = [target]
+        while path[-1] != start:
+            path.append(predecessors[row, path[-1]])
+        return [airports[node] for node in reversed(path)]
 
     results = []
 
     # Compute the best route for every pair of origin and destination airports
-    for origin_airport in origin_airports:
-        for destination_airport in destination_airports:
-            shortest_path = dijkstra(origin_airport, destination_airport)
-            if shortest_path:
-                results.append({
-                    'Origin_city_airport': origin_airport,
-                    'Destination_city_airport': destination_airport,
-                    'Best_route': ' -> '.join(shortest_path)
-                })
+    for row, (origin_airport, start) in enumerate(zip(origin_airports, origin_idx)):
+        for destination_airport, target in zip(destination_airports, destination_idx):
+            if np.isinf(dist_matrix[row, target]):
+                best_route = 'No route found'
             else:
-                results.append({
-                    'Origin_city_airport': origin_airport,
-                    'Destination_city_airport': destination_airport,
-                    'Best_route': 'No route found'
-                })
+                best_route = ' -> '.join(reconstruct_path(row, start, target))
+            results.append({
+                'Origin_city_airport': origin_airport,
+                'Destination_city_airport': destination_airport,
+                'Best_route': best_route
+            })
 
     # Convert results into a DataFrame and return
     result_df = pd.DataFrame(results)